@@ -1,6 +1,6 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import xml.etree.cElementTree as ET
+import xml.etree.ElementTree as ET
 import pprint
 import re
 """
@@ -19,8 +19,8 @@ def process_map(filename):
     users = set()
     for _, element in ET.iterparse(filename):
         user = element.attrib.get('user')
-        if (user is not None) & (user not in users):
-            users.add(element.attrib['user'])
+        if user is not None:
+            users.add(user)
 
     return users
 
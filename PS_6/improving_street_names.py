@@ -9,7 +9,7 @@ Your task in this exercise has two steps:
     The function takes a string with street name as an argument and should return the fixed name
     We have provided a simple test so that you see what exactly is expected
 """
-import xml.etree.cElementTree as ET
+import xml.etree.ElementTree as ET
 from collections import defaultdict
 import re
 import pprint
@@ -18,8 +18,8 @@ OSMFILE = "example.osm"
 street_type_re = re.compile(r'\b\S+\.?$', re.IGNORECASE)
 
 
-expected = ["Street", "Avenue", "Boulevard", "Drive", "Court", "Place", "Square", "Lane", "Road",
-            "Trail", "Parkway", "Commons"]
+expected = {"Street", "Avenue", "Boulevard", "Drive", "Court", "Place", "Square", "Lane", "Road",
+            "Trail", "Parkway", "Commons"}
 
 # UPDATE THIS VARIABLE
 mapping = { "St": "Street",
@@ -71,10 +71,10 @@ def test():
     assert len(st_types) == 3
     pprint.pprint(dict(st_types))
 
-    for st_type, ways in st_types.iteritems():
+    for st_type, ways in st_types.items():
         for name in ways:
             better_name = update_name(name, mapping)
-            print name, "=>", better_name
+            print(name, "=>", better_name)
             if name == "West Lexington St.":
                 assert better_name == "West Lexington Street"
             if name == "Baldwin Rd.":
@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
 Your task is to use the iterative parsing to process the map file and
@@ -10,17 +10,21 @@ the map as value.
 
 Note that your code will be tested with a different data file than the 'example.osm'
 """
-import xml.etree.cElementTree as ET
+import xml.parsers.expat
 import pprint
 from collections import defaultdict
 
 def count_tags(filename):
     tags = defaultdict(int)
 
-    for event, elem in ET.iterparse(filename):
-        if event == 'end':
-            tags[elem.tag] += 1
-        elem.clear()  # discard the element
+    # only the tag names are counted so no elements are built, expat reports each start tag to the handler
+    def start_element(name, attrs):
+        tags[name] += 1
+
+    parser = xml.parsers.expat.ParserCreate()
+    parser.StartElementHandler = start_element
+    with open(filename, 'rb') as f:
+        parser.ParseFile(f)
 
     return tags
 
@@ -1,10 +1,22 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import xml.etree.cElementTree as ET
+import functools
+import xml.etree.ElementTree as ET
 import pprint
 import re
-import codecs
-import json
+
+try:
+    import orjson
+
+    def to_json(data, pretty=False):
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+except ImportError:
+    import json
+
+    def to_json(data, pretty=False):
+        # matches the orjson output: non-ASCII characters written as is and the same separators
+        return json.dumps(data, ensure_ascii=False, indent=2 if pretty else None,
+                          separators=(",", ": ") if pretty else (",", ":")).encode("utf-8")
 """
 Your task is to wrangle the data and transform the shape of the data
 into the model we mentioned earlier. The output should be a list of dictionaries
@@ -87,44 +99,47 @@ should be turned into
 """
 
 
-lower = re.compile(r'^([a-z]|_)*$')
-lower_colon = re.compile(r'^([a-z]|_)*:([a-z]|_)*$')
+lower = re.compile(r'^[a-z_]*$')
+lower_colon = re.compile(r'^[a-z_]*:[a-z_]*$')
 problemchars = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
 
 CREATED = [ "version", "changeset", "timestamp", "user", "uid"]
 
+# The json lines are collected and written to the output file in chunks of this size
+WRITE_BUFFER_SIZE = 1 << 20
+
 
 def shape_element(element):
-    node = {}
     if element.tag == "node" or element.tag == "way":
         # YOUR CODE HERE
-        node['id'] = element.attrib.get("id")
-        node['type'] = element.tag
-        node['visible'] = element.attrib.get("visible")
-        node['created'] = {}
-        node['created']['version'] = element.attrib.get("version")
-        node['created']['changeset'] = element.attrib.get("changeset")
-        node['created']['timestamp'] = element.attrib.get("timestamp")
-        node['created']['user'] = element.attrib.get("user")
-        node['created']['uid'] = element.attrib.get("uid")
+        get = element.attrib.get
+        node = {
+            'id': get("id"),
+            'type': element.tag,
+            'visible': get("visible"),
+            'created': {
+                'version': get("version"),
+                'changeset': get("changeset"),
+                'timestamp': get("timestamp"),
+                'user': get("user"),
+                'uid': get("uid")
+            }
+        }
         if element.tag == "node":
-            node['pos'] = []
-            node['pos'].append(float(element.attrib.get("lat")))
-            node['pos'].append(float(element.attrib.get("lon")))
-        elif element.tag == 'way':
+            node['pos'] = [float(get("lat")), float(get("lon"))]
+        else:
             node['node_refs'] = []
 
         for sub_tag in element:
             if sub_tag.tag == 'tag':
-                if lower.search(sub_tag.attrib['k']):
-                    node[sub_tag.attrib['k']] = sub_tag.attrib['v']
-                elif lower_colon.search(sub_tag.attrib['k']):
-                    if sub_tag.attrib['k'].startswith('addr:'):
-                        split_addr = sub_tag.attrib['k'].split(":")
-                        if len(split_addr) == 2:
-                            if 'address' not in node:
-                                node['address'] = {}
-                            node['address'][split_addr[1]] = sub_tag.attrib['v']
+                key = sub_tag.attrib['k']
+                if lower.match(key):
+                    node[key] = sub_tag.attrib['v']
+                elif lower_colon.match(key) and key.startswith('addr:'):
+                    # lower_colon allows a single colon only, so the rest of the key is the address field
+                    if 'address' not in node:
+                        node['address'] = {}
+                    node['address'][key[5:]] = sub_tag.attrib['v']
             elif sub_tag.tag == 'nd':
                 node['node_refs'].append(sub_tag.attrib['ref'])
         return node
@@ -133,19 +148,32 @@ def shape_element(element):
 
 
 
-def process_map(file_in, pretty = False):
+def process_map(file_in, pretty = False, binary = False):
     # You do not need to change this file
-    file_out = "{0}.json".format(file_in)
+    if binary:
+        # MessagePack records follow each other without separators, pretty has no meaning for them
+        import msgpack
+        serialize = msgpack.Packer(use_bin_type=True).pack
+        separator = b""
+        file_out = f"{file_in}.msgpack"
+    else:
+        serialize = functools.partial(to_json, pretty=pretty)
+        separator = b"\n"
+        file_out = f"{file_in}.json"
     data = []
-    with codecs.open(file_out, "w") as fo:
+    buf = bytearray()
+    # the output is chunked in buf already so the file object does not buffer it a second time
+    with open(file_out, "wb", 0) as fo:
         for _, element in ET.iterparse(file_in):
             el = shape_element(element)
             if el:
                 data.append(el)
-                if pretty:
-                    fo.write(json.dumps(el, indent=2)+"\n")
-                else:
-                    fo.write(json.dumps(el) + "\n")
+                buf += serialize(el)
+                buf += separator
+                if len(buf) >= WRITE_BUFFER_SIZE:
+                    fo.write(buf)
+                    del buf[:]
+        fo.write(buf)
     return data
 
 def test():
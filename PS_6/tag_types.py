@@ -1,6 +1,6 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import xml.etree.cElementTree as ET
+import xml.etree.ElementTree as ET
 import pprint
 import re
 """
@@ -26,16 +26,16 @@ See the 'process_map' and 'test' functions for examples of the expected format.
 """
 
 
-lower = re.compile(r'^([a-z]|_)*$')
-lower_colon = re.compile(r'^([a-z]|_)*:([a-z]|_)*$')
+lower = re.compile(r'^[a-z_]*$')
+lower_colon = re.compile(r'^[a-z_]*:[a-z_]*$')
 problemchars = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
 
 
 def key_type(element, keys):
     if element.tag == "tag":
-        if lower.search(element.attrib['k']):
+        if lower.match(element.attrib['k']):
             keys['lower'] += 1
-        elif lower_colon.search(element.attrib['k']):
+        elif lower_colon.match(element.attrib['k']):
             keys['lower_colon'] += 1
         elif problemchars.search(element.attrib['k']):
             keys['problemchars'] += 1
@@ -1,19 +1,16 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
 A parser for OpenStreetMap XML data file. The first argument of the script is the path to file.
 """
+import functools
 import re
 from collections import defaultdict
 
-try:
-    import xml.etree.cElementTree as ElementTree
-except ImportError:
-    import xml.etree.ElementTree as ElementTree
+from lxml import etree
 
-import pprint
 import sys
-import dateutil.parser
+from datetime import datetime
 
 
 class SkipItem(Exception):
@@ -23,157 +20,241 @@ class SkipItem(Exception):
     pass
 
 
-class MyPrettyPrinter(pprint.PrettyPrinter):
-    """
-    PrettyPrinter implementation for handling the utf-8 characters
-    """
-    def format(self, object, context, maxlevels, level):
-        if isinstance(object, unicode):
-            return (object.encode('utf8'), True, False)
-        return pprint.PrettyPrinter.format(self, object, context, maxlevels, level)
+class ParseStats:
+    """
+    Counters collected while parsing for investigating the data
+    An instance is passed through the parsing functions so they update it through a local instead of globals
+    """
+    __slots__ = ("missing_user_data", "missing_location_data", "missing_common_fields", "element_fields",
+                 "colon_tag_keys", "problem_tag_keys", "unmatched_tag_keys", "wrong_postcodes", "fixme_codes",
+                 "address_types", "street_names", "lowered_street_names")
+
+    def __init__(self):
+        # Used to store the missing user values (if there are any)
+        self.missing_user_data = {
+            "username": 0,
+            "uid": 0
+        }
+
+        # Used to store missing location data if any
+        self.missing_location_data = {
+            "lat": 0,
+            "lon": 0,
+            "node": 0,
+            "way": 0
+        }
+
+        # Used to store missing common fields if any
+        self.missing_common_fields = {
+            "version": 0,
+            "timestamp": 0,
+            "changeset": 0
+        }
+
+        self.element_fields = set()
+        self.colon_tag_keys = defaultdict(int)
+        self.problem_tag_keys = defaultdict(int)
+        self.unmatched_tag_keys = defaultdict(int)
+        self.wrong_postcodes = defaultdict(int)
+        self.fixme_codes = 0
+        self.address_types = defaultdict(int)
+        self.street_names = defaultdict(int)
+        self.lowered_street_names = defaultdict(int)
 
 
 # Tags we're interested in collecting
-COLLECTED_ITEMS = ["node", "way"]
+COLLECTED_ITEMS = frozenset(["node", "way"])
+
+# Top level tags pruned while streaming the file, the relations are not collected but would pile up in memory
+# A tuple as it is handed to the tag filter of lxml's iterparse
+PRUNED_ITEMS = ("node", "way", "relation")
 
 # Tags for which we get the location
-POSITIONED_ITEMS = ["node"]
+POSITIONED_ITEMS = frozenset(["node"])
 
 # Tags for which we collect node references
-REFERENCE_ITEMS = ["way"]
-
-# Used to store the missing user values (if there are any)
-missing_user_data = {
-    "username": 0,
-    "uid": 0
-}
-
-# Used to store missing location data if any
-missing_location_data = {
-    "lat": 0,
-    "lon": 0,
-    "node": 0,
-    "way": 0
-}
-
-# Used to store missing common fields if any
-missing_common_fields = {
-    "version": 0,
-    "timestamp": 0,
-    "changeset": 0
-}
+REFERENCE_ITEMS = frozenset(["way"])
 
 # Initialization of some variables used later in the parser
-element_fields = []
-colon_tag_keys = defaultdict(int)
-problem_tag_keys = defaultdict(int)
-unmatched_tag_keys = defaultdict(int)
-wrong_postcodes = defaultdict(int)
-saved_bul = {}
-saved_str = {}
-saved_pl = {}
-fixme_codes = 0
-address_types = defaultdict(int)
-street_names = defaultdict(int)
-lowered_street_names = defaultdict(int)
+saved_streets = {}
+
+# Number of records sent to MongoDB in one insert
+INSERT_BATCH_SIZE = 1000
 
 # Regular expressions for scanning the <tag> elements for correct keys
-lower = re.compile(r'^([a-z]|_)*$')
-lower_colon = re.compile(r'^([a-z]|_)*:([a-z]|_)*$')
+lower = re.compile(r'^[a-z_]*$')
+lower_colon = re.compile(r'^[a-z_]*:[a-z_]*$')
 problemchars = re.compile(r'[=\+/&<>;\'"\?%#$@,\. \t\r\n]')
 
+# Regex for the addr:<type> keys, capturing the address type
+address_key_regex = re.compile(r'^addr:([^:]*)$')
+
 # Expected street prefixes
 street_prefixes = [
-    unicode("бул", "utf-8"),
-    unicode("ул", "utf-8"),
-    unicode("пл", "utf-8"),
+    "бул",
+    "ул",
+    "пл",
 ]
 
-# Regex used to scan the steet:addr tags for prefixes inconsistencies
-street_prefix_regex = re.compile('(' + "|".join(street_prefixes) + ')(\s\.|\.\s|\.|\s)(?=\S)',
+# Regex used to scan the steet:addr tags for prefixes inconsistencies, anchored as the prefixes only lead the name
+street_prefix_regex = re.compile('^(' + "|".join(street_prefixes) + r')(\s\.|\.\s|\.|\s)(?=\S)',
                                  re.UNICODE | re.IGNORECASE)
 
+# Abbreviated street types as they appear in the corrected street names
+BUL = "бул."
+UL = "ул."
+PL = "пл."
+BUL_PREFIX = BUL + " "
+UL_PREFIX = UL + " "
+PL_PREFIX = PL + " "
+
+# Full words for "boulevard", "street" and "square" which are shortened to the abbreviations above
+BULEVARD = "булевард"
+ULITSA = "улица"
+PLOSHTAD = "площад"
+
+# Full street type words mapped to their abbreviations
+street_type_abbreviations = {
+    ULITSA: UL,
+    BULEVARD: BUL,
+    PLOSHTAD: PL,
+}
 
-def parse_user(element):
-    """
-    Parse a node or way element for extracting user data
+# Regex matching a street name starting with a full street type word
+street_type_regex = re.compile('^(' + "|".join(street_type_abbreviations) + ')', re.UNICODE)
 
-    :param element: an ET.element
-    :return: a dictionary with user data
-    """
-    user_name = element.attrib.get("user")
-    user_id = element.attrib.get("uid")
+# A street name starting with one of these already has an abbreviated street type
+abbreviated_street_types = (UL, BUL, PL)
 
-    if user_name is None:
-        missing_user_data["username"] += 1
+# Prefixes of the corrected street names saved for the 2nd pass, by precedence when a name has more than one
+saved_street_precedence = {
+    BUL_PREFIX: 0,
+    UL_PREFIX: 1,
+    PL_PREFIX: 2,
+}
 
-    if user_id is None:
-        missing_user_data["uid"] += 1
+# Regex matching a corrected street name with one of the saved prefixes
+saved_street_regex = re.compile('^(' + "|".join(re.escape(prefix) for prefix in saved_street_precedence) + ')',
+                                re.UNICODE)
+
+# Prefix of residential districts ("жилищен комплекс") entered as streets
+ZHK = "жк."
 
-    return {"name": user_name, "id": user_id}
+# Unnecessary quotes in street names, as a translate() table deleting them
+BAD_CHARS = str.maketrans("", "", "\"'”„“")
 
 
-def parse_location(element):
+def intern_string(value):
+    """
+    Return a single shared instance for equal strings so the repeating values are stored only once
+    :param value: string or None
+    :return: the shared instance of the value
+    """
+    if value is None:
+        return None
+    return sys.intern(value)
+
+
+def parse_location(element, stats):
     """
     Parse a node or way element for extracting location data
 
     :param element: an ET.element
-    :return: a size 2 list with lat and lon and empty list if one is missing
+    :param stats: ParseStats collecting the missing data
+    :return: a size 2 tuple with lat and lon and empty tuple if one is missing
     """
-    lat = element.attrib.get("lat")
-    lon = element.attrib.get("lon")
+    lat = element.get("lat")
+    lon = element.get("lon")
 
     if lat is None:
         # Save missing data for further investigation
-        missing_location_data["lat"] += 1
-        missing_location_data[element.tag] += 1
-        return []
+        stats.missing_location_data["lat"] += 1
+        stats.missing_location_data[element.tag] += 1
+        return ()
 
     if lon is None:
         # Save missing data for further investigation
-        missing_location_data["lon"] += 1
-        return []
+        stats.missing_location_data["lon"] += 1
+        return ()
 
-    return [float(lat), float(lon)]
+    return float(lat), float(lon)
 
 
-def parse_file(filename):
+def iterate_elements(filename):
     """
-    This is the entry point of the parsing mechanism
-    It is actually first pass of parsing as there are some parsings later which improve based on the first pass values
+    Stream the collected elements of the file one by one
+    Every element is discarded together with the already processed siblings after it is handled for freeing up memory
 
     :param filename: file path
-    :return: The parsed data with all the entries
+    :return: generator of ET.element
     """
-    data = []
-    skipped_items = 0
-    for _, elem in ElementTree.iterparse(filename, events=('start',)):
-
+    # Only the pruned tags reach Python and they arrive on 'end' so their <tag>/<nd> children are already parsed
+    for _, elem in etree.iterparse(filename, events=('end',), tag=PRUNED_ITEMS):
         if elem.tag in COLLECTED_ITEMS:
-            try:
-                data.append(parse_element(elem))
-            except SkipItem:
-                # Log skipped
-                skipped_items += 1
-        # discard the element for freeing up memory
+            yield elem
         elem.clear()
+        parent = elem.getparent()
+        while elem.getprevious() is not None:
+            del parent[0]
 
-    print "Skipped items: {}".format(skipped_items)
-    return data
 
+def learn_street_names(filename):
+    """
+    This is the first pass of the parsing mechanism
+    Only the street names are read in order to save the correct prefixes which are used for completing the
+    street names on the second pass
 
-def parse_common_field(element, field):
+    :param filename: file path
+    :return: void
     """
-    A parsing function for any tag attribute that does not require any special treatment
-    :param element: ET.element
-    :param field: string with field name
-    :return: string value
+    # The counters of the 2nd pass are the ones reported so the ones updated here are thrown away
+    stats = ParseStats()
+    for elem in iterate_elements(filename):
+        try:
+            for sub_tag in elem.iterchildren("tag"):
+                tag_key = sub_tag.get("k")
+                if tag_key == "addr:street":
+                    street_name = sub_tag.get("v")
+                    if not skip_street(street_name):
+                        save_street_name(correct_street_name(street_name))
+                elif tag_key == "addr:postcode":
+                    # An element dropped by parse_element stops saving its streets at the same tag
+                    parse_postcode(sub_tag.get("v"), stats)
+        except SkipItem:
+            pass
+
+
+def parse_file(filename, stats):
     """
-    value = element.attrib.get(field)
-    if value is None:
-        missing_common_fields[value] += 1
+    This is the entry point of the parsing mechanism
+    It is actually the second pass of parsing as the street names are completed based on the first pass values
+
+    :param filename: file path
+    :param stats: ParseStats collecting the counters of the parsed entries
+    :return: generator of the parsed entries
+    """
+    skipped_items = 0
+    for elem in iterate_elements(filename):
+        try:
+            yield parse_element(elem, stats)
+        except SkipItem:
+            # Log skipped
+            skipped_items += 1
+
+    print(f"Skipped items: {skipped_items}")
+
 
-    return value
+@functools.lru_cache(maxsize=4096)
+def parse_timestamp(timestamp):
+    """
+    Parse an OSM timestamp
+    The timestamps are always written as YYYY-MM-DDTHH:MM:SSZ so the fields are read from fixed positions
+    The elements of a changeset share their timestamps so a bounded cache of the recent values skips most of the parsing
+    :param timestamp: string timestamp
+    :return: datetime in UTC
+    """
+    return datetime(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+                    int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19]))
 
 
 def parse_node_refs(element):
@@ -182,54 +263,69 @@ def parse_node_refs(element):
     :param element: ET.element
     :return: and array of node ids
     """
-    node_refs = []
-    for sub_tag in element:
-        if sub_tag.tag == "nd":
-            node_refs.append(sub_tag.attrib['ref'])
+    return [sub_tag.get("ref") for sub_tag in element.iterchildren("nd")]
+
 
-    return node_refs
+@functools.lru_cache(maxsize=None)
+def classify_tag_key(tag_key):
+    """
+    Classify a <tag> key by the characters it contains
+    The keys repeat all over the file so every key is matched against the regular expressions only once
+    :param tag_key: the k attribute of a <tag> element
+    :return: "lower", "colon", "problem" or "unmatched"
+    """
+    if lower.match(tag_key):
+        return "lower"
+    elif lower_colon.match(tag_key):
+        return "colon"
+    elif problemchars.search(tag_key):
+        return "problem"
+    else:
+        return "unmatched"
 
 
-def scan_tags(element):
+def scan_tags(element, stats):
     """
     parsing function for <tag> elements to check whether they have missing k or v attributes
     :param element:
+    :param stats: ParseStats collecting the tag keys
     :return: void
     """
     for sub_tag in element:
         if sub_tag.tag == "tag":
-            tag_key = sub_tag.attrib["k"]
-            if lower.search(tag_key):
-                pass
-            elif lower_colon.search(tag_key) is not None:
-                colon_tag_keys[tag_key] += 1
-            elif problemchars.search(tag_key) is not None:
-                problem_tag_keys[tag_key] += 1
-            else:
-                unmatched_tag_keys[tag_key] += 1
+            tag_key = sub_tag.get("k")
+            key_type = classify_tag_key(tag_key)
+            if key_type == "colon":
+                stats.colon_tag_keys[tag_key] += 1
+            elif key_type == "problem":
+                stats.problem_tag_keys[tag_key] += 1
+            elif key_type == "unmatched":
+                stats.unmatched_tag_keys[tag_key] += 1
 
 
-def parse_postcode(code):
+def parse_postcode(code, stats):
     """
     A special function for parsing post codes based on the knowledge of regional restrictions
     Items were skipped after they were first investigated and we're sure they do not belong to the dataset
     :param code:
+    :param stats: ParseStats counting the FIXME codes
     :return: int post code
     """
-    global fixme_codes
-    try:
-        numeric = int(code)
+    # Check the digits up front as most of the codes are valid and raising ValueError is expensive
+    # isdecimal() only passes what int() parses, so no ValueError can escape from here
+    digits = code.strip()
+    if digits.isdecimal():
+        numeric = int(digits)
 
         if 1000 <= numeric < 2000:
             return numeric
         else:
             raise SkipItem
-    except ValueError:
-        if code == "FIXME" or code == "fixme":
-            fixme_codes += 1
-            return None
-        else:
-            raise SkipItem
+    elif digits == "FIXME" or digits == "fixme":
+        stats.fixme_codes += 1
+        return None
+    else:
+        raise SkipItem
 
 
 def add_address_value(item, field, value):
@@ -247,67 +343,123 @@ def add_address_value(item, field, value):
     item["address"][field] = value
 
 
-def parse_element(element):
+def parse_element(element, stats):
     """
     This is the heart of the parsing mechanism
     The input is an ET.element whose tags are iterated and parsed one by one in case we're interested in them
 
     :param element: ET.element
+    :param stats: ParseStats collecting the counters of the entry
     :return: a dictionary representing the parsed entry
     """
-    for attrib in element.attrib:
-        if attrib not in element_fields:
-            element_fields.append(attrib)
+    attrib = element.attrib
+    get = attrib.get
+    tag = element.tag
+    stats.element_fields.update(attrib)
+
+    user_name = intern_string(get("user"))
+    user_id = intern_string(get("uid"))
+    timestamp = get("timestamp")
+    changeset = intern_string(get("changeset"))
+    version = intern_string(get("version"))
+
+    # Save missing data for further investigation
+    if user_name is None:
+        stats.missing_user_data["username"] += 1
+    if user_id is None:
+        stats.missing_user_data["uid"] += 1
+    if timestamp is None:
+        stats.missing_common_fields["timestamp"] += 1
+    if changeset is None:
+        stats.missing_common_fields["changeset"] += 1
+    if version is None:
+        stats.missing_common_fields["version"] += 1
 
     item = {
-        "id": element.attrib.get("id"),
-        "user": parse_user(element),
-        "timestamp": dateutil.parser.parse(parse_common_field(element, "timestamp")),
-        "changeset": parse_common_field(element, "changeset"),
-        "version": parse_common_field(element, "version"),
-        "type": element.tag
+        "id": get("id"),
+        "user": {"name": user_name, "id": user_id},
+        "timestamp": parse_timestamp(timestamp),
+        "changeset": changeset,
+        "version": version,
+        "type": tag
     }
 
-    if element.tag in POSITIONED_ITEMS:
-        item["location"] = parse_location(element)
+    if tag in POSITIONED_ITEMS:
+        item["location"] = parse_location(element, stats)
 
-    if element.tag in REFERENCE_ITEMS:
+    if tag in REFERENCE_ITEMS:
         item["node_refs"] = parse_node_refs(element)
 
-    for sub_tag in element:
-        if sub_tag.tag == "tag":
-            if sub_tag.attrib["k"] == "amenity":
-                item["amenity"] = sub_tag.attrib["v"].strip()
+    address_types = stats.address_types
+    street_names = stats.street_names
+    lowered_street_names = stats.lowered_street_names
+
+    # lxml picks the <tag> children by name in C, the <nd> ones were already read by parse_node_refs
+    for sub_tag in element.iterchildren("tag"):
+        tag_key = sub_tag.get("k")
+        tag_value = sub_tag.get("v")
+        if tag_key == "amenity":
+            item["amenity"] = intern_string(tag_value.strip())
+        elif tag_key == "name":
+            item["name"] = tag_value.strip()
+        else:
             # Collect addresses
-            elif sub_tag.attrib["k"].startswith("addr:"):
-                split = sub_tag.attrib["k"].split(":")
-                if len(split) == 2:
-                    if split[1] == "postcode":
-                        add_address_value(item, "postcode", parse_postcode(sub_tag.attrib["v"]))
-                    elif split[1] == "street" and not skip_street(sub_tag.attrib["v"]):
-                        correct_name = correct_street_name(sub_tag.attrib["v"])
-                        street_names[correct_name] += 1
-                        lowered_street_names[correct_name.lower()] += 1
-                        add_address_value(item, "street", correct_name)
-                        # Save the correct names for usage later on the 2nd pass
-                        if correct_name.startswith(unicode("бул. ", "utf-8")):
-                            saved_bul[correct_name.replace(unicode("бул. ", "utf-8"), "").lower()] = correct_name
-                        elif correct_name.startswith(unicode("ул. ", "utf-8")):
-                            saved_str[correct_name.replace(unicode("ул. ", "utf-8"), "").lower()] = correct_name
-                        elif correct_name.startswith(unicode("пл. ", "utf-8")):
-                            saved_pl[correct_name.replace(unicode("пл. ", "utf-8"), "").lower()] = correct_name
-                    elif split[1] == "suburb":
-                        add_address_value(item, "suburb", sub_tag.attrib["v"].strip())
-
-                    address_types[split[1]] += 1
-            elif sub_tag.attrib["k"] == "name":
-                item["name"] = sub_tag.attrib["v"].strip()
-
-    # scan_tags(element)
+            match = address_key_regex.match(tag_key)
+            if match:
+                address_type = match.group(1)
+                if address_type == "postcode":
+                    add_address_value(item, "postcode", parse_postcode(tag_value, stats))
+                elif address_type == "street" and not skip_street(tag_value):
+                    correct_name = correct_street_name(tag_value)
+                    name_lower = lower_street_name(correct_name)
+                    street_names[correct_name] += 1
+                    lowered_street_names[name_lower] += 1
+                    add_address_value(item, "street", complete_street_name(correct_name, name_lower))
+                elif address_type == "suburb":
+                    add_address_value(item, "suburb", intern_string(tag_value.strip()))
+
+                address_types[address_type] += 1
+
+    # scan_tags(element, stats)
 
     return item
 
 
+def save_street_name(correct_name):
+    """
+    Save a corrected street name with a prefix by its lowered name without the prefix
+    so that the same street can be completed when it is found without a prefix
+    :param correct_name: corrected street name
+    :return: void
+    """
+    prefix_match = saved_street_regex.match(correct_name)
+    if prefix_match:
+        precedence = saved_street_precedence[prefix_match.group(1)]
+        name_lower = correct_name[prefix_match.end():].lower()
+        saved = saved_streets.get(name_lower)
+        # Names seen with more than one prefix are rare so the precedence of the saved one is only looked up then
+        if saved is None or precedence <= saved_street_precedence[saved_street_regex.match(saved).group(1)]:
+            saved_streets[name_lower] = correct_name
+
+
+def complete_street_name(correct_name, name_lower):
+    """
+    Here we use what we've "learned" on the first pass.
+    Streets missing prefixes have their lower() version matched against those with correct prefixes.
+    This way we can programmatically identify prefixes. For all that is left apply the "Str. " prefix
+    :param correct_name: corrected street name
+    :param name_lower: the lower() version of the corrected street name
+    :return: street name with a prefix
+    """
+    if correct_name.startswith(abbreviated_street_types):
+        return correct_name
+
+    saved = saved_streets.get(name_lower)
+    if saved is not None:
+        return saved
+    return UL_PREFIX + correct_name
+
+
 def sort_dict(d):
     """
     Helper function for sorting dictionaries
@@ -318,21 +470,25 @@ def sort_dict(d):
     return sorted(d.items(), key=lambda x: x[1], reverse=True)
 
 
+# Manual selection of found issues
+manually_skipped_streets = frozenset([
+    "no",
+    "apartments",
+    "c",
+    "Tietotie"
+])
+
+# Values starting with these are links or residential districts rather than streets
+skipped_street_prefixes = ("http", ZHK)
+
+
 def skip_street(orig_street_name):
     """
     A function used to decided whether we should skip adding the street value because it is incorrect
     :param orig_street_name:
     :return:
     """
-    # Manual selection of found issues
-    manually_skipped_streets = [
-        "no",
-        "apartments",
-        "c",
-        "Tietotie"
-    ]
-    return orig_street_name.startswith("http") or orig_street_name.startswith(
-        unicode("жк.", "utf-8")) or orig_street_name in manually_skipped_streets
+    return orig_street_name.startswith(skipped_street_prefixes) or orig_street_name in manually_skipped_streets
 
 # Street name which had more than 1 variance of capitalization. This is a selected correct way of writing them
 manually_corrected_names = [
@@ -352,11 +508,8 @@ manually_corrected_names = [
     "Детелин войвода"
 ]
 
-manual_street_names_ref = {}
-
 # Convert the above list in dictionary of type [{"lower name": "Cap Name"}] in order to correct capitalizations
-for name in manually_corrected_names:
-    manual_street_names_ref[unicode(name, "utf-8").lower()] = unicode(name, "utf-8")
+manual_street_names_ref = dict((name.lower(), name) for name in manually_corrected_names)
 
 # Manual translations
 manually_translated_streets = {
@@ -377,53 +530,60 @@ manually_translated_streets = {
     'Srebarna': "Сребърна",
     'Tsarigradsko Chausse Blvd': "Цариградско шосе",
     'bul.Tzar Boris III': "Цар Борис III",
-    u'\u0426\u0430\u0440 \u0411\u043e\u0440\u0438\u0441 \u0406\u0406\u0406': "Цар Борис III"
+    '\u0426\u0430\u0440 \u0411\u043e\u0440\u0438\u0441 \u0406\u0406\u0406': "Цар Борис III"
 }
 
 
+@functools.lru_cache(maxsize=None)
 def correct_street_name(str_name):
     """
     A function for parsing and correcting street names
+    The same names repeat in many addresses so every raw value is corrected only once
     :param str_name:
     :return:
     """
+    return intern_string(normalize_street_name(str_name))
+
 
-    # Unnecessary quotes
-    bad_chars = [
-        unicode("'", "utf-8"),
-        unicode('"', "utf-8"),
-        unicode('”', "utf-8"),
-        unicode('„', "utf-8"),
-        unicode('“', "utf-8")
-    ]
+# The corrected street names repeat so each one is lowered only once
+lower_street_name = functools.lru_cache(maxsize=None)(str.lower)
+
+
+def normalize_street_name(str_name):
+    """
+    Clean the quotes, shorten the street type and apply the manual corrections to a raw street name
+    :param str_name:
+    :return:
+    """
     # Clean leading/trailing whitespaces and quotes
-    str_name = re.sub('[\'"' + "".join(bad_chars) + ']', '', str_name.strip())
+    str_name = str_name.strip().translate(BAD_CHARS)
 
     # Convert full words "boulevard", "street", "square" to their shortened version
-    if str_name.startswith(unicode("улица", "utf-8")):
-        str_name = str_name.replace(unicode("улица", "utf-8"), unicode("ул.", "utf-8"))
-    elif str_name.startswith(unicode("булевард", "utf-8")):
-        str_name = str_name.replace(unicode("булевард", "utf-8"), unicode("бул.", "utf-8"))
-    elif str_name.startswith(unicode("площад", "utf-8")):
-        str_name = str_name.replace(unicode("площад", "utf-8"), unicode("пл.", "utf-8"))
+    match = street_type_regex.match(str_name)
+    if match:
+        str_name = street_type_abbreviations[match.group(1)] + str_name[match.end():]
 
     # Apply manual corrections
     if str_name.lower() in manual_street_names_ref:
         return manual_street_names_ref[str_name.lower()]
     elif str_name in manually_translated_streets:
-        return unicode(manually_translated_streets[str_name], "utf-8")
+        return manually_translated_streets[str_name]
     else:
-        return street_prefix_regex.sub(lambda m: m.group(1).lower() + ". ", str_name)
+        match = street_prefix_regex.match(str_name)
+        if match:
+            return match.group(1).lower() + ". " + str_name[match.end():]
+        return str_name
 
 
-def add_record(db, record):
+def add_records(db, records):
     """
-    Adds reocord in the MongoDB
+    Adds a batch of records in the MongoDB with a single round-trip
     :param db:
-    :param record:
+    :param records: list of records
     :return:
     """
-    db.osm_data.insert(record)
+    if records:
+        db.osm_data.insert_many(records, ordered=False)
 
 
 def get_db():
@@ -435,71 +595,73 @@ def get_db():
     client = MongoClient('localhost:27017')
     return client.project3
 
+
+def test():
+    # The memoized correct_street_name has to give the same names as the plain normalize_street_name
+    # The 2nd call of every value is served from the cache
+    expected_names = {
+        "„Витоша“": "Витоша",
+        " \"Оборище\" ": "Оборище",
+        "улица Оборище": "ул. Оборище",
+        "булевард Витоша": "бул. Витоша",
+        "бул. витоша": "бул. Витоша",
+        "Atanas Kirchev": "Атанас Кирчев",
+        "ул.Солунска": "ул. Солунска",
+        "БУЛ Фрит": "бул. Фрит",
+        "пл .Света Неделя": "пл. Света Неделя",
+        "Граф Игнатиев": "Граф Игнатиев",
+    }
+    for _ in range(2):
+        for raw_name, correct_name in expected_names.items():
+            assert correct_street_name(raw_name) == normalize_street_name(raw_name) == correct_name
+
 if __name__ == "__main__":
+    test()
+
     # Parsed file passed from the terminal as parameter
-    processed_data = parse_file(sys.argv[1])
-
-    # print "Missing user data:"
-    # pprint.pprint(missing_user_data)
-    # print "Missing location data:"
-    # pprint.pprint(missing_location_data)
-    # print "Missing common fields"
-    # pprint.pprint(missing_common_fields)
-    # print "Possible element fields:"
-    # pprint.pprint(element_fields)
-    # print "Colon <tag> keys:"
-    # pprint.pprint(sort_dict(colon_tag_keys))
-    # print "Problem <tag> keys:"
-    # pprint.pprint(sort_dict(problem_tag_keys))
-    # print "Unmatched <tag> keys:"
-    # pprint.pprint(sort_dict(unmatched_tag_keys))
-    # print "Address types"
-    # pprint.pprint(dict(address_types))
-    # print "Wrong postcodes"
-    # pprint.pprint(dict(wrong_postcodes))
-    # print "FIXME codes: {}".format(fixme_codes)
-    # print "Street names"
-    # MyPrettyPrinter().pprint(dict(lowered_street_names))
-    # for street_name in street_names:
-    #     if street_names[street_name] != lowered_street_names[street_name.lower()]:
-    #         print street_name
-    # MyPrettyPrinter().pprint(dict(street_names))
+    learn_street_names(sys.argv[1])
+    stats = ParseStats()
 
     # Used while auditing data to check the remaining issues
     unfinished_streets = defaultdict(int)
     db = get_db()
 
-    for entry in processed_data:
-        """
-        Here we make a second pass for the addresses based on what we've "learned" until this point.
-        At this point only streets missing prefixes are left and their lower() version is matched against
-        those with correct prefixes. This way we can programmatically identify prefixes.
-        For all that is left aplly the "Str. " prefix
-        """
-        if "address" in entry:
-            if "street" in entry["address"]:
-                street_name = entry["address"]["street"]
-                if (not street_name.startswith(unicode("ул.", "utf-8"))) and \
-                        (not street_name.startswith(unicode("бул.", "utf-8"))) and \
-                        (not street_name.startswith(unicode("пл.", "utf-8"))):
-                    street_name_lower = street_name.lower()
-                    if street_name_lower in saved_bul:
-                        entry["address"]["street"] = saved_bul[street_name_lower]
-                    elif street_name_lower in saved_str:
-                        entry["address"]["street"] = saved_str[street_name_lower]
-                    elif street_name_lower in saved_pl:
-                        entry["address"]["street"] = saved_pl[street_name_lower]
-                    else:
-                        entry["address"]["street"] = unicode("ул. ", "utf-8") + street_name
-
-        add_record(db, entry)
-
-    # MyPrettyPrinter().pprint(dict(unfinished_streets))
-    # MyPrettyPrinter().pprint(saved_str)
-    # MyPrettyPrinter().pprint(saved_str)
-    # MyPrettyPrinter().pprint(saved_pl)
-    # print lowered_street_names
-
-    # export to json
-    # with open('data.json', 'w') as outfile:
-    #     json.dump(processed_data, outfile)
+    # The entries are inserted while the file is parsed so only one batch is kept in memory
+    batch = []
+    for entry in parse_file(sys.argv[1], stats):
+        batch.append(entry)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            add_records(db, batch)
+            batch = []
+
+    add_records(db, batch)
+
+    # import pprint
+    # print("Missing user data:")
+    # pprint.pprint(stats.missing_user_data)
+    # print("Missing location data:")
+    # pprint.pprint(stats.missing_location_data)
+    # print("Missing common fields")
+    # pprint.pprint(stats.missing_common_fields)
+    # print("Possible element fields:")
+    # pprint.pprint(sorted(stats.element_fields))
+    # print("Colon <tag> keys:")
+    # pprint.pprint(sort_dict(stats.colon_tag_keys))
+    # print("Problem <tag> keys:")
+    # pprint.pprint(sort_dict(stats.problem_tag_keys))
+    # print("Unmatched <tag> keys:")
+    # pprint.pprint(sort_dict(stats.unmatched_tag_keys))
+    # print("Address types")
+    # pprint.pprint(dict(stats.address_types))
+    # print("Wrong postcodes")
+    # pprint.pprint(dict(stats.wrong_postcodes))
+    # print(f"FIXME codes: {stats.fixme_codes}")
+    # print("Street names")
+    # pprint.pprint(dict(stats.lowered_street_names))
+    # for street_name in stats.street_names:
+    #     if stats.street_names[street_name] != stats.lowered_street_names[street_name.lower()]:
+    #         print(street_name)
+    # pprint.pprint(dict(stats.street_names))
+    # pprint.pprint(dict(unfinished_streets))
+    # pprint.pprint(saved_streets)
+    # print(stats.lowered_street_names)
@@ -1,4 +1,5 @@
-# coding=utf-8
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
 import re
 
 
@@ -7,15 +8,15 @@ A test area for regex matching of street prefixes
 """
 
 search = [
-    unicode("бул", "utf-8"),
-    unicode("ул", "utf-8"),
-    unicode("пл.", "utf-8"),
+    "бул",
+    "ул",
+    "пл.",
 ]
 
-regex = re.compile('(' + "|".join(search) + ')(\s\.|\.\s|\.|\s)(?=\S)', re.UNICODE | re.IGNORECASE)
-print regex.sub(lambda m: m.group(1).lower() + ". ", unicode("бул. Фрит", "utf-8"))
-print regex.sub(lambda m: m.group(1).lower() + ". ", unicode("бул.Фрит", "utf-8"))
-print regex.sub(lambda m: m.group(1).lower() + ". ", unicode("бул Фрит", "utf-8"))
-print regex.sub(lambda m: m.group(1).lower() + ". ", unicode("Бул. Фрит", "utf-8"))
-print regex.sub(lambda m: m.group(1).lower() + ". ", unicode("БУЛ.Фрит", "utf-8"))
-print regex.sub(lambda m: m.group(1).lower() + ". ", unicode("ул .Солунска", "utf-8"))
\ No newline at end of file
+regex = re.compile('(' + "|".join(search) + r')(\s\.|\.\s|\.|\s)(?=\S)', re.UNICODE | re.IGNORECASE)
+print(regex.sub(lambda m: m.group(1).lower() + ". ", "бул. Фрит"))
+print(regex.sub(lambda m: m.group(1).lower() + ". ", "бул.Фрит"))
+print(regex.sub(lambda m: m.group(1).lower() + ". ", "бул Фрит"))
+print(regex.sub(lambda m: m.group(1).lower() + ". ", "Бул. Фрит"))
+print(regex.sub(lambda m: m.group(1).lower() + ". ", "БУЛ.Фрит"))
+print(regex.sub(lambda m: m.group(1).lower() + ". ", "ул .Солунска"))
\ No newline at end of file